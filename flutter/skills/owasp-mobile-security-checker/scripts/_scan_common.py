@@ -0,0 +1,161 @@
+"""
+Helpers shared by the OWASP scanner scripts in this directory.
+
+Each script is run directly (``python3 scripts/<name>.py``), which puts this directory
+first on ``sys.path``, so the scripts import this module by its plain name.
+"""
+
+import os
+import re
+import json
+import mmap
+import argparse
+from contextlib import contextmanager
+from pathlib import Path
+from typing import AbstractSet, Any, Callable, Dict, Iterator, List, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Code-generator output (build_runner, freezed, mockito, injectable) skipped by default
+GENERATED_SUFFIXES = ('.g.dart', '.freezed.dart', '.mocks.dart', '.config.dart')
+
+# Files at least this large are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 64 * 1024
+
+# Raw file content handed to the per-file scanners
+Source = Union[bytes, mmap.mmap]
+
+
+# Flags union_patterns can express inline, so any engine's compile function accepts them
+_INLINE_FLAGS = ((re.IGNORECASE, b'i'), (re.MULTILINE, b'm'), (re.DOTALL, b's'))
+
+
+def union_patterns(patterns: List[Tuple[bytes, str]], flags: int = 0,
+                   compile: Callable[[bytes], Any] = re.compile) -> Tuple[Any, List[str], List[int]]:
+    """Combine (pattern, issue) pairs into one regex with a named group g<i> per pattern.
+
+    Also returns each pattern's issue and the group number holding its value (its first
+    capture group, or the whole named group when it has none). Flags are written inline as
+    (?i) etc., so compile may be another engine's, e.g. google-re2's, which takes no flags.
+    """
+    unsupported = flags & ~(re.IGNORECASE | re.MULTILINE | re.DOTALL)
+    if unsupported:
+        raise ValueError(f'union_patterns cannot inline flags {unsupported!r}')
+
+    parts, issues, value_groups = [], [], []
+    group = 0
+    for i, (pattern, issue_type) in enumerate(patterns):
+        inner_groups = re.compile(pattern).groups
+        group += 1
+        parts.append(b'(?P<g%d>%s)' % (i, pattern))
+        issues.append(issue_type)
+        value_groups.append(group + 1 if inner_groups else group)
+        group += inner_groups
+
+    inline = b''.join(letter for flag, letter in _INLINE_FLAGS if flags & flag)
+    combined = (b'(?%s)' % inline if inline else b'') + b'|'.join(parts)
+    return compile(combined), issues, value_groups
+
+
+def positive_int(value: str) -> int:
+    """argparse type for worker counts: an integer of at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'must be a positive integer, got {value!r}')
+    return number
+
+
+@contextmanager
+def open_source(file_path: Union[str, Path]) -> Iterator[Source]:
+    """Yield a file's raw content, memory-mapping files of MMAP_THRESHOLD bytes or more.
+
+    mmap objects have no ``in`` or ``count`` for substrings, so callers use ``find``.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            yield f.read()
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+
+class LineCursor:
+    """Map match offsets to line numbers by counting newlines forward from the previous match.
+
+    finditer yields matches in ascending order, so every byte of content is counted at most
+    once per scanner instead of once per match.
+    """
+
+    def __init__(self, content: Source):
+        self.content = content
+        self.offset = 0
+        self.line_num = 1
+
+    def line_at(self, pos: int) -> Tuple[int, bytes]:
+        """Return the 1-based line number and raw text of the line containing pos."""
+        content = self.content
+        start = content.rfind(b'\n', 0, pos) + 1
+        if start < self.offset:
+            self.offset, self.line_num = 0, 1
+        self.line_num += content[self.offset:start].count(b'\n')
+        self.offset = start
+
+        end = content.find(b'\n', pos)
+        if end == -1:
+            end = len(content)
+        return self.line_num, content[start:end]
+
+
+def iter_files(root: Union[str, Path], suffix: str, exclude: Tuple[str, ...] = (),
+               pruned: AbstractSet[str] = frozenset()) -> Iterator[str]:
+    """Yield paths of files under root ending in suffix, skipping directories named in pruned
+    and files ending in an exclude suffix.
+
+    Nothing is pruned by default: under lib/ a directory called build or .dart_tool holds
+    hand-written sources (Flutter's own build output lives at the project root).
+    """
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in pruned:
+                            stack.append(entry.path)
+                    elif entry.name.endswith(suffix) and not entry.name.endswith(exclude) and entry.is_file():
+                        yield entry.path
+        except OSError:
+            continue
+
+
+def dedupe_findings(findings: List[Dict]) -> List[Dict]:
+    """Drop repeated findings for the same file, line and issue, keeping the first."""
+    seen = set()
+    unique = []
+    for finding in findings:
+        key = (finding['file'], finding['line'], finding['issue'])
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(finding)
+    return unique
+
+
+def write_json(output_file: Path, data: Dict) -> None:
+    """Write data as indented, key-sorted JSON, using orjson when it is installed."""
+    if orjson is not None:
+        output_file.write_bytes(orjson.dumps(
+            data,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE
+        ))
+    else:
+        # Raw UTF-8 rather than \u escapes, matching orjson's output byte for byte
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=True, ensure_ascii=False)
+            f.write('\n')
@@ -9,129 +9,139 @@ This script checks for insecure data storage patterns, including:
 """
 
 import re
-import json
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict
-
-
-def scan_shared_preferences_usage(file_path: Path) -> List[Dict]:
-    """Scan for insecure SharedPreferences usage."""
-    findings = []
-
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            lines = content.split('\n')
-
-            # Check for SharedPreferences import
-            has_shared_prefs = 'package:shared_preferences' in content
-            has_secure_storage = 'package:flutter_secure_storage' in content
-
-            if has_shared_prefs:
-                # Look for sensitive data being stored
-                sensitive_patterns = [
-                    (r'setString\(["\'](?:token|auth|password|secret|key|credential)["\']', 'Token/Credential storage'),
-                    (r'setString\(["\'].*(?:api|jwt|bearer).*["\']', 'API key storage'),
-                    (r'setInt\(["\'](?:pin|otp|code)["\']', 'PIN/OTP storage'),
-                ]
-
-                for line_num, line in enumerate(lines, 1):
-                    for pattern, issue_type in sensitive_patterns:
-                        if re.search(pattern, line, re.IGNORECASE):
-                            findings.append({
-                                'file': str(file_path),
-                                'line': line_num,
-                                'issue': f'{issue_type} in unencrypted SharedPreferences',
-                                'code': line.strip(),
-                                'severity': 'HIGH',
-                                'recommendation': 'Use flutter_secure_storage instead'
-                            })
-
-    except Exception as e:
-        print(f"Error scanning {file_path}: {e}")
-
-    return findings
-
-
-def scan_file_storage(file_path: Path) -> List[Dict]:
-    """Scan for insecure file storage patterns."""
-    findings = []
-
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            lines = content.split('\n')
-
-            # Patterns for insecure file operations
-            insecure_patterns = [
-                (r'File\(.*\)\.writeAsString\((?!.*encrypt)', 'Unencrypted file write'),
-                (r'File\(.*\)\.writeAsBytes\((?!.*encrypt)', 'Unencrypted file write'),
-                (r'openWrite\(', 'Potentially unencrypted stream write'),
-            ]
-
-            for line_num, line in enumerate(lines, 1):
-                for pattern, issue_type in insecure_patterns:
-                    if re.search(pattern, line):
-                        # Check if encryption is mentioned nearby
-                        context_start = max(0, line_num - 3)
-                        context_end = min(len(lines), line_num + 3)
-                        context = '\n'.join(lines[context_start:context_end])
-
-                        if 'encrypt' not in context.lower():
-                            findings.append({
-                                'file': str(file_path),
-                                'line': line_num,
-                                'issue': issue_type,
-                                'code': line.strip(),
-                                'severity': 'MEDIUM',
-                                'recommendation': 'Encrypt sensitive data before writing to files'
-                            })
-
-    except Exception as e:
-        print(f"Error scanning {file_path}: {e}")
-
-    return findings
-
-
-def scan_database_security(file_path: Path) -> List[Dict]:
-    """Scan for insecure database implementations."""
-    findings = []
-
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            lines = content.split('\n')
-
-            # Check for sqflite without encryption
-            has_sqflite = 'package:sqflite' in content
-            has_encrypted_sqflite = 'sqflite_sqlcipher' in content
-
-            if has_sqflite and not has_encrypted_sqflite:
-                findings.append({
-                    'file': str(file_path),
-                    'line': 1,
-                    'issue': 'Unencrypted SQLite database',
-                    'code': 'import package:sqflite',
-                    'severity': 'HIGH',
-                    'recommendation': 'Consider using sqflite_sqlcipher for encrypted databases'
-                })
-
-            # Check for raw SQL queries (injection risk)
-            for line_num, line in enumerate(lines, 1):
-                if re.search(r'rawQuery\(["\']SELECT.*\$', line):
-                    findings.append({
-                        'file': str(file_path),
-                        'line': line_num,
-                        'issue': 'Potential SQL injection via string interpolation',
-                        'code': line.strip(),
-                        'severity': 'HIGH',
-                        'recommendation': 'Use parameterized queries with whereArgs'
-                    })
-
-    except Exception as e:
-        print(f"Error scanning {file_path}: {e}")
-
-    return findings
+from typing import List, Dict, Optional, Tuple
+
+from _scan_common import (
+    GENERATED_SUFFIXES,
+    LineCursor,
+    Source,
+    dedupe_findings,
+    iter_files,
+    open_source,
+    positive_int,
+    union_patterns,
+    write_json,
+)
+
+# Sensitive keys written to unencrypted SharedPreferences
+SENSITIVE_PREFS_PATTERNS = [
+    (rb'setString\(["\'](?:token|auth|password|secret|key|credential)["\']', 'Token/Credential storage'),
+    (rb'setString\(["\'][^"\'\n]*(?:api|jwt|bearer)[^"\'\n]*["\']', 'API key storage'),
+    (rb'setInt\(["\'](?:pin|otp|code)["\']', 'PIN/OTP storage'),
+]
+
+# File writes that may persist plaintext data; File(...) allows one level of nested
+# parentheses, and encryption is ruled out by the context check in scan_file_storage
+INSECURE_FILE_PATTERNS = [
+    (rb'File\((?:[^()\n]|\([^()\n]*\))*\)\.writeAsString\(', 'Unencrypted file write'),
+    (rb'File\((?:[^()\n]|\([^()\n]*\))*\)\.writeAsBytes\(', 'Unencrypted file write'),
+    (rb'openWrite\(', 'Potentially unencrypted stream write'),
+]
+
+# Raw SQL built with string interpolation; only the literal's own (unescaped) delimiter
+# ends it, so quoted values inside the SQL (WHERE name = '$name') are still covered
+_RAW_QUERY_RE = re.compile(
+    rb'rawQuery\((?:"SELECT(?:[^"\\\n]|\\.)*\$|\'SELECT(?:[^\'\\\n]|\\.)*\$)'
+)
+
+_SENSITIVE_PREFS_RE, _SENSITIVE_PREFS_TYPES, _ = union_patterns(SENSITIVE_PREFS_PATTERNS, re.IGNORECASE)
+_INSECURE_FILE_RE, _INSECURE_FILE_TYPES, _ = union_patterns(INSECURE_FILE_PATTERNS)
+
+
+def _context_window(content: Source, pos: int, before: int = 2, after: int = 3) -> bytes:
+    """Return the lines surrounding pos (the matching line plus before/after lines)."""
+    start = content.rfind(b'\n', 0, pos) + 1
+    for _ in range(before):
+        if start == 0:
+            break
+        start = content.rfind(b'\n', 0, start - 1) + 1
+    end = content.find(b'\n', pos)
+    for _ in range(after):
+        if end == -1:
+            break
+        end = content.find(b'\n', end + 1)
+    if end == -1:
+        end = len(content)
+    return content[start:end]
+
+
+def scan_shared_preferences_usage(file_path: str, content: Source, findings: List[Dict]) -> None:
+    """Scan for insecure SharedPreferences usage, appending to findings."""
+    # Check for SharedPreferences import
+    has_shared_prefs = content.find(b'package:shared_preferences') != -1
+    has_secure_storage = content.find(b'package:flutter_secure_storage') != -1
+
+    if has_shared_prefs:
+        # Look for sensitive data being stored
+        lines = LineCursor(content)
+        for match in _SENSITIVE_PREFS_RE.finditer(content):
+            issue_type = _SENSITIVE_PREFS_TYPES[int(match.lastgroup[1:])]
+            line_num, line = lines.line_at(match.start())
+            findings.append({
+                'file': str(file_path),
+                'line': line_num,
+                'issue': f'{issue_type} in unencrypted SharedPreferences',
+                'code': line.strip().decode('utf-8', 'replace'),
+                'severity': 'HIGH',
+                'recommendation': 'Use flutter_secure_storage instead'
+            })
+
+
+def scan_file_storage(file_path: str, content: Source, findings: List[Dict]) -> None:
+    """Scan for insecure file storage patterns, appending to findings."""
+    if content.find(b'File(') == -1 and content.find(b'openWrite(') == -1:
+        return
+
+    lines = LineCursor(content)
+    for match in _INSECURE_FILE_RE.finditer(content):
+        # Check if encryption is mentioned nearby
+        context = _context_window(content, match.start())
+
+        if b'encrypt' not in context.lower():
+            line_num, line = lines.line_at(match.start())
+            findings.append({
+                'file': str(file_path),
+                'line': line_num,
+                'issue': _INSECURE_FILE_TYPES[int(match.lastgroup[1:])],
+                'code': line.strip().decode('utf-8', 'replace'),
+                'severity': 'MEDIUM',
+                'recommendation': 'Encrypt sensitive data before writing to files'
+            })
+
+
+def scan_database_security(file_path: str, content: Source, findings: List[Dict]) -> None:
+    """Scan for insecure database implementations, appending to findings."""
+    # Check for sqflite without encryption
+    has_sqflite = content.find(b'package:sqflite') != -1
+    has_encrypted_sqflite = content.find(b'sqflite_sqlcipher') != -1
+
+    if has_sqflite and not has_encrypted_sqflite:
+        findings.append({
+            'file': str(file_path),
+            'line': 1,
+            'issue': 'Unencrypted SQLite database',
+            'code': 'import package:sqflite',
+            'severity': 'HIGH',
+            'recommendation': 'Consider using sqflite_sqlcipher for encrypted databases'
+        })
+
+    # Check for raw SQL queries (injection risk)
+    if content.find(b'rawQuery(') != -1:
+        lines = LineCursor(content)
+        for match in _RAW_QUERY_RE.finditer(content):
+            line_num, line = lines.line_at(match.start())
+            findings.append({
+                'file': str(file_path),
+                'line': line_num,
+                'issue': 'Potential SQL injection via string interpolation',
+                'code': line.strip().decode('utf-8', 'replace'),
+                'severity': 'HIGH',
+                'recommendation': 'Use parameterized queries with whereArgs'
+            })
 
 
 def scan_backup_configuration(project_root: Path) -> List[Dict]:
@@ -172,27 +182,49 @@ def scan_backup_configuration(project_root: Path) -> List[Dict]:
     return findings
 
 
-def scan_project(project_root: str) -> Dict:
+def _scan_one_file(file_path: str, findings: Optional[List[Dict]] = None) -> List[Dict]:
+    """Read a Dart file once and run every per-file storage scanner on it.
+
+    Findings are appended to ``findings`` (a new list when omitted), which is returned.
+    """
+    if findings is None:
+        findings = []
+
+    try:
+        with open_source(file_path) as content:
+            scan_shared_preferences_usage(file_path, content, findings)
+            scan_file_storage(file_path, content, findings)
+            scan_database_security(file_path, content, findings)
+    except Exception as e:
+        print(f"Error scanning {file_path}: {e}")
+
+    return findings
+
+
+def scan_project(project_root: str, jobs: Optional[int] = None, exclude: Tuple[str, ...] = GENERATED_SUFFIXES) -> Dict:
     """Scan entire Flutter project for storage security issues."""
     project_path = Path(project_root)
     all_findings = []
 
     # Get all Dart files
-    dart_files = list(project_path.glob('lib/**/*.dart'))
+    dart_files = list(iter_files(project_path / 'lib', '.dart', exclude))
 
     print(f"Scanning {len(dart_files)} Dart files for storage security issues...")
 
-    for file_path in dart_files:
-        findings = []
-        findings.extend(scan_shared_preferences_usage(file_path))
-        findings.extend(scan_file_storage(file_path))
-        findings.extend(scan_database_security(file_path))
-        all_findings.extend(findings)
+    if jobs == 1:
+        for file_path in dart_files:
+            _scan_one_file(file_path, all_findings)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for findings in executor.map(_scan_one_file, dart_files, chunksize=32):
+                all_findings.extend(findings)
 
     # Check Android backup configuration
     backup_findings = scan_backup_configuration(project_path)
     all_findings.extend(backup_findings)
 
+    all_findings = dedupe_findings(all_findings)
+
     return {
         'total_files_scanned': len(dart_files),
         'total_findings': len(all_findings),
@@ -204,11 +236,21 @@ def main():
     """Main execution function."""
     import sys
 
-    project_root = sys.argv[1] if len(sys.argv) > 1 else '.'
+    parser = argparse.ArgumentParser(description='OWASP M9: Analyze data storage security in a Flutter project')
+    parser.add_argument('project_root', nargs='?', default='.',
+                        help='Flutter project root (default: current directory)')
+    parser.add_argument('--jobs', type=positive_int, default=None,
+                        help='Worker processes for file scanning (default: CPU count, 1 scans serially)')
+    parser.add_argument('--exclude', default=','.join(GENERATED_SUFFIXES),
+                        help='Comma-separated file suffixes to skip (default: %(default)s, "" scans all)')
+    args = parser.parse_args()
+    exclude = tuple(suffix.strip() for suffix in args.exclude.split(',') if suffix.strip())
+
+    project_root = args.project_root
 
     print(f"OWASP M9: Analyzing data storage security in {project_root}\n")
 
-    results = scan_project(project_root)
+    results = scan_project(project_root, jobs=args.jobs, exclude=exclude)
 
     print(f"\n{'='*60}")
     print("Storage Security Scan Results:")
@@ -216,28 +258,25 @@ def main():
     print(f"Files scanned: {results['total_files_scanned']}")
     print(f"Issues found: {results['total_findings']}\n")
 
-    if results['findings']:
-        # Group by severity
-        by_severity = {'CRITICAL': [], 'HIGH': [], 'MEDIUM': [], 'LOW': []}
-        for finding in results['findings']:
-            severity = finding.get('severity', 'MEDIUM')
-            by_severity[severity].append(finding)
-
-        for severity in ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']:
-            if by_severity[severity]:
-                print(f"\n{severity} Severity ({len(by_severity[severity])}):")
-                print('-' * 60)
-                for i, finding in enumerate(by_severity[severity], 1):
-                    print(f"\n{i}. {finding['issue']}")
-                    print(f"   File: {finding['file']}:{finding['line']}")
-                    if finding.get('code'):
-                        print(f"   Code: {finding['code']}")
-                    print(f"   Recommendation: {finding['recommendation']}")
+    # Group by severity
+    by_severity = defaultdict(list)
+    for finding in results['findings']:
+        by_severity[finding.get('severity', 'MEDIUM')].append(finding)
+
+    for severity in ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']:
+        if by_severity[severity]:
+            print(f"\n{severity} Severity ({len(by_severity[severity])}):")
+            print('-' * 60)
+            for i, finding in enumerate(by_severity[severity], 1):
+                print(f"\n{i}. {finding['issue']}")
+                print(f"   File: {finding['file']}:{finding['line']}")
+                if finding.get('code'):
+                    print(f"   Code: {finding['code']}")
+                print(f"   Recommendation: {finding['recommendation']}")
 
     # Save results
     output_file = Path(project_root) / 'owasp_m9_storage_scan.json'
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=2)
+    write_json(output_file, results)
 
     print(f"\n{'='*60}")
     print(f"Results saved to: {output_file}")
@@ -10,8 +10,22 @@ import yaml
 import json
 import subprocess
 import sys
+from collections import defaultdict
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from _scan_common import write_json
+
+try:
+    from yaml import CSafeLoader as _YamlLoader  # libyaml-backed loader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    from packaging.version import InvalidVersion, Version
+except ImportError:
+    Version = None
 
 
 def load_pubspec(project_root: str) -> Dict:
@@ -23,7 +37,7 @@ def load_pubspec(project_root: str) -> Dict:
         sys.exit(1)
 
     with open(pubspec_path, 'r') as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=_YamlLoader)
 
 
 def check_version_constraints(pubspec: Dict) -> List[Dict]:
@@ -60,33 +74,65 @@ def check_version_constraints(pubspec: Dict) -> List[Dict]:
     return findings
 
 
-def check_outdated_packages(project_root: str) -> Dict:
-    """Run 'flutter pub outdated' to check for outdated packages."""
+def start_outdated_check(project_root: str) -> Optional[subprocess.Popen]:
+    """Launch 'flutter pub outdated' in the background so local checks can run meanwhile."""
     try:
-        result = subprocess.run(
+        return subprocess.Popen(
             ['flutter', 'pub', 'outdated', '--json'],
             cwd=project_root,
-            capture_output=True,
-            text=True,
-            timeout=60
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
         )
+    except FileNotFoundError:
+        print("Warning: flutter command not found. Skipping outdated check.")
+        return None
+    except Exception as e:
+        print(f"Warning: Error running flutter pub outdated: {e}")
+        return None
 
-        if result.returncode == 0:
-            return json.loads(result.stdout)
+
+def collect_outdated_packages(proc: Optional[subprocess.Popen]) -> Dict:
+    """Wait for a 'flutter pub outdated' run started by start_outdated_check and parse its output."""
+    if proc is None:
+        return {}
+
+    try:
+        stdout, stderr = proc.communicate(timeout=60)
+
+        if proc.returncode == 0:
+            return json.loads(stdout)
         else:
-            print(f"Warning: flutter pub outdated failed: {result.stderr}")
+            print(f"Warning: flutter pub outdated failed: {stderr}")
             return {}
     except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
         print("Warning: flutter pub outdated timed out")
         return {}
-    except FileNotFoundError:
-        print("Warning: flutter command not found. Skipping outdated check.")
-        return {}
     except Exception as e:
         print(f"Warning: Error running flutter pub outdated: {e}")
         return {}
 
 
+def check_outdated_packages(project_root: str) -> Dict:
+    """Run 'flutter pub outdated' to check for outdated packages."""
+    return collect_outdated_packages(start_outdated_check(project_root))
+
+
+@lru_cache(maxsize=None)
+def _major_version(version: str) -> int:
+    """Return the major component of a version string, or 0 if it cannot be parsed."""
+    if Version is not None:
+        try:
+            return Version(version).major
+        except InvalidVersion:
+            pass
+
+    major = version.split('.')[0]
+    return int(major) if major.isdigit() else 0
+
+
 def analyze_outdated_results(outdated_data: Dict) -> List[Dict]:
     """Analyze outdated packages data."""
     findings = []
@@ -104,10 +150,7 @@ def analyze_outdated_results(outdated_data: Dict) -> List[Dict]:
             severity = 'MEDIUM'
             # Determine severity based on version gap
             if current and latest:
-                current_major = int(current.split('.')[0]) if current.split('.')[0].isdigit() else 0
-                latest_major = int(latest.split('.')[0]) if latest.split('.')[0].isdigit() else 0
-
-                if latest_major > current_major:
+                if _major_version(latest) > _major_version(current):
                     severity = 'HIGH'
 
             findings.append({
@@ -166,21 +209,24 @@ def main():
 
     all_findings = []
 
+    # Check for outdated packages (runs in the background during the local checks)
+    print("Checking for outdated packages...")
+    outdated_proc = start_outdated_check(project_root)
+
     # Check version constraints
     print("Checking version constraints...")
     constraint_findings = check_version_constraints(pubspec)
     all_findings.extend(constraint_findings)
 
-    # Check for outdated packages
-    print("Checking for outdated packages...")
-    outdated_data = check_outdated_packages(project_root)
+    # Check for dangerous packages
+    print("Checking for known vulnerable packages...")
+    dangerous_findings = check_dangerous_packages(pubspec)
+
+    outdated_data = collect_outdated_packages(outdated_proc)
     if outdated_data:
         outdated_findings = analyze_outdated_results(outdated_data)
         all_findings.extend(outdated_findings)
 
-    # Check for dangerous packages
-    print("Checking for known vulnerable packages...")
-    dangerous_findings = check_dangerous_packages(pubspec)
     all_findings.extend(dangerous_findings)
 
     # Print results
@@ -189,31 +235,28 @@ def main():
     print(f"{'='*60}")
     print(f"Total issues found: {len(all_findings)}\n")
 
-    if all_findings:
-        # Group by severity
-        by_severity = {'CRITICAL': [], 'HIGH': [], 'MEDIUM': [], 'LOW': []}
-        for finding in all_findings:
-            severity = finding.get('severity', 'MEDIUM')
-            by_severity[severity].append(finding)
-
-        for severity in ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']:
-            if by_severity[severity]:
-                print(f"\n{severity} Severity ({len(by_severity[severity])}):")
-                print('-' * 60)
-                for finding in by_severity[severity]:
-                    print(f"\nPackage: {finding['package']}")
-                    print(f"Issue: {finding['issue']}")
-                    if 'current_version' in finding:
-                        print(f"Current: {finding['current_version']}, Latest: {finding['latest_version']}")
-                    print(f"Recommendation: {finding['recommendation']}")
+    # Group by severity
+    by_severity = defaultdict(list)
+    for finding in all_findings:
+        by_severity[finding.get('severity', 'MEDIUM')].append(finding)
+
+    for severity in ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']:
+        if by_severity[severity]:
+            print(f"\n{severity} Severity ({len(by_severity[severity])}):")
+            print('-' * 60)
+            for finding in by_severity[severity]:
+                print(f"\nPackage: {finding['package']}")
+                print(f"Issue: {finding['issue']}")
+                if 'current_version' in finding:
+                    print(f"Current: {finding['current_version']}, Latest: {finding['latest_version']}")
+                print(f"Recommendation: {finding['recommendation']}")
 
     # Save results
     output_file = Path(project_root) / 'owasp_m2_dependencies_scan.json'
-    with open(output_file, 'w') as f:
-        json.dump({
-            'total_issues': len(all_findings),
-            'findings': all_findings
-        }, f, indent=2)
+    write_json(output_file, {
+        'total_issues': len(all_findings),
+        'findings': all_findings
+    })
 
     print(f"\n{'='*60}")
     print(f"Results saved to: {output_file}")
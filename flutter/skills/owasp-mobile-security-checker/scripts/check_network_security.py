@@ -10,96 +10,111 @@ This script analyzes Flutter project for:
 """
 
 import re
-import json
-import xml.etree.ElementTree as ET
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+
+from _scan_common import (
+    GENERATED_SUFFIXES,
+    LineCursor,
+    Source,
+    dedupe_findings,
+    iter_files,
+    open_source,
+    positive_int,
+    union_patterns,
+    write_json,
+)
+
+try:
+    from lxml import etree as ET  # libxml2-backed parser when available
+    # Never expand entities from the scanned project
+    _XML_PARSER = ET.XMLParser(resolve_entities=False, no_network=True)
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _XML_PARSER = None
+
+# Patterns for HTTP usage
+HTTP_PATTERNS = [
+    (rb'http://(?!localhost|127\.0\.0\.1|0\.0\.0\.0)', 'HTTP URL (non-localhost)'),
+    (rb'["\']http:["\']', 'HTTP scheme'),
+    (rb'ws://', 'Insecure WebSocket'),
+]
+
+# Literals one of HTTP_PATTERNS needs, in any case; files without any skip the full regex
+_HTTP_MARKERS_RE = re.compile(rb'http:|ws://', re.IGNORECASE)
+
+# Certificate callback that accepts every certificate (the lambda may be wrapped onto the next line)
+_BAD_CERT_RE = re.compile(rb'badCertificateCallback\s*=\s*\([^)]*\)\s*=>\s*true')
+
+# ATS disabled via NSAllowsArbitraryLoads
+_ARBITRARY_LOADS_RE = re.compile(r'NSAllowsArbitraryLoads.*<true/>', re.DOTALL)
+
+_HTTP_RE, _HTTP_TYPES, _ = union_patterns(HTTP_PATTERNS, re.IGNORECASE)
+
+
+def scan_http_usage(file_path: str, content: Source, findings: List[Dict]) -> None:
+    """Scan for insecure HTTP usage instead of HTTPS, appending to findings."""
+    if not _HTTP_MARKERS_RE.search(content):
+        return
+
+    lines = LineCursor(content)
+    for match in _HTTP_RE.finditer(content):
+        line_num, line = lines.line_at(match.start())
+
+        # Skip comments
+        if line.lstrip().startswith(b'//'):
+            continue
 
+        findings.append({
+            'file': str(file_path),
+            'line': line_num,
+            'issue': _HTTP_TYPES[int(match.lastgroup[1:])],
+            'code': line.strip().decode('utf-8', 'replace'),
+            'severity': 'HIGH',
+            'recommendation': 'Use HTTPS/WSS instead of HTTP/WS'
+        })
 
-def scan_http_usage(file_path: Path) -> List[Dict]:
-    """Scan for insecure HTTP usage instead of HTTPS."""
-    findings = []
-
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            lines = content.split('\n')
-
-            # Patterns for HTTP usage
-            http_patterns = [
-                (r'http://(?!localhost|127\.0\.0\.1|0\.0\.0\.0)', 'HTTP URL (non-localhost)'),
-                (r'["\']http:["\']', 'HTTP scheme'),
-                (r'ws://', 'Insecure WebSocket'),
-            ]
-
-            for line_num, line in enumerate(lines, 1):
-                # Skip comments
-                if line.strip().startswith('//'):
-                    continue
-
-                for pattern, issue_type in http_patterns:
-                    matches = re.finditer(pattern, line, re.IGNORECASE)
-                    for match in matches:
-                        findings.append({
-                            'file': str(file_path),
-                            'line': line_num,
-                            'issue': issue_type,
-                            'code': line.strip(),
-                            'severity': 'HIGH',
-                            'recommendation': 'Use HTTPS/WSS instead of HTTP/WS'
-                        })
-
-    except Exception as e:
-        print(f"Error scanning {file_path}: {e}")
-
-    return findings
-
-
-def check_certificate_pinning(file_path: Path) -> List[Dict]:
-    """Check for certificate pinning implementation."""
-    findings = []
-
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-
-            # Check for HTTP client with custom certificate validation
-            has_http_client = 'HttpClient' in content
-            has_bad_cert_callback = 'badCertificateCallback' in content
 
-            if has_bad_cert_callback:
-                # Check if it's accepting all certificates (insecure)
-                if re.search(r'badCertificateCallback.*=.*\(.*\).*=>.*true', content):
-                    findings.append({
-                        'file': str(file_path),
-                        'line': 0,
-                        'issue': 'Certificate validation disabled (accepts all certificates)',
-                        'code': 'badCertificateCallback = (...) => true',
-                        'severity': 'CRITICAL',
-                        'recommendation': 'Remove this in production or implement proper certificate pinning'
-                    })
+def check_certificate_pinning(file_path: str, content: Source, findings: List[Dict]) -> None:
+    """Check for certificate pinning implementation, appending to findings."""
+    # Check for HTTP client with custom certificate validation
+    has_http_client = content.find(b'HttpClient') != -1
+    has_bad_cert_callback = content.find(b'badCertificateCallback') != -1
 
-            # Check for certificate pinning packages
-            has_cert_pinning = any(pkg in content for pkg in [
-                'http_certificate_pinning',
-                'cert_pinning',
-                'ssl_pinning_plugin'
-            ])
+    if not has_http_client and not has_bad_cert_callback:
+        return
 
-            if has_http_client and not has_cert_pinning and not has_bad_cert_callback:
-                findings.append({
-                    'file': str(file_path),
-                    'line': 0,
-                    'issue': 'No certificate pinning detected',
-                    'code': 'HttpClient usage without pinning',
-                    'severity': 'MEDIUM',
-                    'recommendation': 'Consider implementing certificate pinning for sensitive APIs'
-                })
+    if has_bad_cert_callback:
+        # Check if it's accepting all certificates (insecure)
+        if _BAD_CERT_RE.search(content):
+            findings.append({
+                'file': str(file_path),
+                'line': 0,
+                'issue': 'Certificate validation disabled (accepts all certificates)',
+                'code': 'badCertificateCallback = (...) => true',
+                'severity': 'CRITICAL',
+                'recommendation': 'Remove this in production or implement proper certificate pinning'
+            })
 
-    except Exception as e:
-        print(f"Error scanning {file_path}: {e}")
+    # Check for certificate pinning packages
+    has_cert_pinning = any(content.find(pkg) != -1 for pkg in [
+        b'http_certificate_pinning',
+        b'cert_pinning',
+        b'ssl_pinning_plugin'
+    ])
 
-    return findings
+    if has_http_client and not has_cert_pinning and not has_bad_cert_callback:
+        findings.append({
+            'file': str(file_path),
+            'line': 0,
+            'issue': 'No certificate pinning detected',
+            'code': 'HttpClient usage without pinning',
+            'severity': 'MEDIUM',
+            'recommendation': 'Consider implementing certificate pinning for sensitive APIs'
+        })
 
 
 def check_android_network_security(project_root: Path) -> List[Dict]:
@@ -120,7 +135,7 @@ def check_android_network_security(project_root: Path) -> List[Dict]:
         return findings
 
     try:
-        tree = ET.parse(network_security_config)
+        tree = ET.parse(str(network_security_config), _XML_PARSER)
         root = tree.getroot()
 
         # Check for cleartextTrafficPermitted
@@ -171,7 +186,7 @@ def check_ios_ats_configuration(project_root: Path) -> List[Dict]:
             # Check if ATS is disabled globally
             if 'NSAllowsArbitraryLoads' in content:
                 # Extract the value
-                if re.search(r'NSAllowsArbitraryLoads.*<true/>', content, re.DOTALL):
+                if _ARBITRARY_LOADS_RE.search(content):
                     findings.append({
                         'file': str(info_plist),
                         'line': 0,
@@ -198,21 +213,41 @@ def check_ios_ats_configuration(project_root: Path) -> List[Dict]:
     return findings
 
 
-def scan_project(project_root: str) -> Dict:
+def _scan_one_file(file_path: str, findings: Optional[List[Dict]] = None) -> List[Dict]:
+    """Read a Dart file once and run every per-file network scanner on it.
+
+    Findings are appended to ``findings`` (a new list when omitted), which is returned.
+    """
+    if findings is None:
+        findings = []
+
+    try:
+        with open_source(file_path) as content:
+            scan_http_usage(file_path, content, findings)
+            check_certificate_pinning(file_path, content, findings)
+    except Exception as e:
+        print(f"Error scanning {file_path}: {e}")
+
+    return findings
+
+
+def scan_project(project_root: str, jobs: Optional[int] = None, exclude: Tuple[str, ...] = GENERATED_SUFFIXES) -> Dict:
     """Scan entire Flutter project for network security issues."""
     project_path = Path(project_root)
     all_findings = []
 
     # Get all Dart files
-    dart_files = list(project_path.glob('lib/**/*.dart'))
+    dart_files = list(iter_files(project_path / 'lib', '.dart', exclude))
 
     print(f"Scanning {len(dart_files)} Dart files for network security issues...")
 
-    for file_path in dart_files:
-        findings = []
-        findings.extend(scan_http_usage(file_path))
-        findings.extend(check_certificate_pinning(file_path))
-        all_findings.extend(findings)
+    if jobs == 1:
+        for file_path in dart_files:
+            _scan_one_file(file_path, all_findings)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for findings in executor.map(_scan_one_file, dart_files, chunksize=32):
+                all_findings.extend(findings)
 
     # Check platform-specific configurations
     android_findings = check_android_network_security(project_path)
@@ -221,6 +256,8 @@ def scan_project(project_root: str) -> Dict:
     ios_findings = check_ios_ats_configuration(project_path)
     all_findings.extend(ios_findings)
 
+    all_findings = dedupe_findings(all_findings)
+
     return {
         'total_files_scanned': len(dart_files),
         'total_findings': len(all_findings),
@@ -232,11 +269,21 @@ def main():
     """Main execution function."""
     import sys
 
-    project_root = sys.argv[1] if len(sys.argv) > 1 else '.'
+    parser = argparse.ArgumentParser(description='OWASP M5: Analyze network security in a Flutter project')
+    parser.add_argument('project_root', nargs='?', default='.',
+                        help='Flutter project root (default: current directory)')
+    parser.add_argument('--jobs', type=positive_int, default=None,
+                        help='Worker processes for file scanning (default: CPU count, 1 scans serially)')
+    parser.add_argument('--exclude', default=','.join(GENERATED_SUFFIXES),
+                        help='Comma-separated file suffixes to skip (default: %(default)s, "" scans all)')
+    args = parser.parse_args()
+    exclude = tuple(suffix.strip() for suffix in args.exclude.split(',') if suffix.strip())
+
+    project_root = args.project_root
 
     print(f"OWASP M5: Analyzing network security in {project_root}\n")
 
-    results = scan_project(project_root)
+    results = scan_project(project_root, jobs=args.jobs, exclude=exclude)
 
     print(f"\n{'='*60}")
     print("Network Security Scan Results:")
@@ -244,34 +291,31 @@ def main():
     print(f"Files scanned: {results['total_files_scanned']}")
     print(f"Issues found: {results['total_findings']}\n")
 
-    if results['findings']:
-        # Group by severity
-        by_severity = {'CRITICAL': [], 'HIGH': [], 'MEDIUM': [], 'LOW': []}
-        for finding in results['findings']:
-            severity = finding.get('severity', 'MEDIUM')
-            by_severity[severity].append(finding)
-
-        for severity in ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']:
-            if by_severity[severity]:
-                print(f"\n{severity} Severity ({len(by_severity[severity])}):")
-                print('-' * 60)
-                for i, finding in enumerate(by_severity[severity], 1):
-                    print(f"\n{i}. {finding['issue']}")
-                    print(f"   File: {finding['file']}:{finding['line']}")
-                    if finding.get('code'):
-                        print(f"   Code: {finding['code']}")
-                    print(f"   Recommendation: {finding['recommendation']}")
+    # Group by severity
+    by_severity = defaultdict(list)
+    for finding in results['findings']:
+        by_severity[finding.get('severity', 'MEDIUM')].append(finding)
+
+    for severity in ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']:
+        if by_severity[severity]:
+            print(f"\n{severity} Severity ({len(by_severity[severity])}):")
+            print('-' * 60)
+            for i, finding in enumerate(by_severity[severity], 1):
+                print(f"\n{i}. {finding['issue']}")
+                print(f"   File: {finding['file']}:{finding['line']}")
+                if finding.get('code'):
+                    print(f"   Code: {finding['code']}")
+                print(f"   Recommendation: {finding['recommendation']}")
 
     # Save results
     output_file = Path(project_root) / 'owasp_m5_network_scan.json'
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=2)
+    write_json(output_file, results)
 
     print(f"\n{'='*60}")
     print(f"Results saved to: {output_file}")
 
     # Exit with error if critical/high issues found
-    critical_high = len(by_severity.get('CRITICAL', [])) + len(by_severity.get('HIGH', []))
+    critical_high = len(by_severity['CRITICAL']) + len(by_severity['HIGH'])
     sys.exit(1 if critical_high > 0 else 0)
 
 
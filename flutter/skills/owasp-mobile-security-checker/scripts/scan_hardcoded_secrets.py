@@ -9,149 +9,255 @@ passwords, and other sensitive credentials in Dart source files.
 import re
 import os
 import json
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple
-
-# Patterns for detecting hardcoded secrets
+from typing import Iterable, Iterator, List, Dict, Optional, TextIO, Tuple
+
+from _scan_common import LineCursor, iter_files, open_source, positive_int, union_patterns
+
+# RE2 matches in linear time whatever the input; the stdlib engine is the fallback
+try:
+    import re2 as _re_engine
+except ImportError:
+    _re_engine = re
+
+# Directories to scan and the file extension checked in each
+SCAN_DIRS = {
+    'lib': '.dart',
+    'android': '.gradle',
+    'ios': '.plist',
+}
+
+# Directories skipped per scan root: android/ and ios/ hold native build output, the Gradle
+# cache and CocoaPods checkouts; lib/ is sources only, so nothing under it is skipped
+_PLATFORM_PRUNED_DIRS = frozenset({'build', '.gradle', 'Pods', '.dart_tool', '.git', '.idea'})
+_PRUNED_DIRS = {
+    'android': _PLATFORM_PRUNED_DIRS,
+    'ios': _PLATFORM_PRUNED_DIRS,
+}
+
+# Patterns for detecting hardcoded secrets (files are scanned whole, so none may cross a newline)
 SECRET_PATTERNS = [
     # API Keys and Tokens
-    (r'api[_-]?key\s*[:=]\s*["\']([a-zA-Z0-9_\-]{20,})["\']', 'API Key'),
-    (r'apikey\s*[:=]\s*["\']([a-zA-Z0-9_\-]{20,})["\']', 'API Key'),
-    (r'api[_-]?secret\s*[:=]\s*["\']([a-zA-Z0-9_\-]{20,})["\']', 'API Secret'),
-    (r'access[_-]?token\s*[:=]\s*["\']([a-zA-Z0-9_\-]{20,})["\']', 'Access Token'),
-    (r'auth[_-]?token\s*[:=]\s*["\']([a-zA-Z0-9_\-]{20,})["\']', 'Auth Token'),
-    (r'bearer\s+["\']([a-zA-Z0-9_\-\.]{20,})["\']', 'Bearer Token'),
+    (rb'api[_-]?key[^\S\n]*[:=][^\S\n]*["\']([a-zA-Z0-9_\-]{20,})["\']', 'API Key'),
+    (rb'apikey[^\S\n]*[:=][^\S\n]*["\']([a-zA-Z0-9_\-]{20,})["\']', 'API Key'),
+    (rb'api[_-]?secret[^\S\n]*[:=][^\S\n]*["\']([a-zA-Z0-9_\-]{20,})["\']', 'API Secret'),
+    (rb'access[_-]?token[^\S\n]*[:=][^\S\n]*["\']([a-zA-Z0-9_\-]{20,})["\']', 'Access Token'),
+    (rb'auth[_-]?token[^\S\n]*[:=][^\S\n]*["\']([a-zA-Z0-9_\-]{20,})["\']', 'Auth Token'),
+    (rb'bearer[^\S\n]+["\']([a-zA-Z0-9_\-\.]{20,})["\']', 'Bearer Token'),
 
     # AWS Credentials
-    (r'aws[_-]?access[_-]?key[_-]?id\s*[:=]\s*["\']([A-Z0-9]{20})["\']', 'AWS Access Key'),
-    (r'aws[_-]?secret[_-]?access[_-]?key\s*[:=]\s*["\']([a-zA-Z0-9/+=]{40})["\']', 'AWS Secret Key'),
+    (rb'aws[_-]?access[_-]?key[_-]?id[^\S\n]*[:=][^\S\n]*["\']([A-Z0-9]{20})["\']', 'AWS Access Key'),
+    (rb'aws[_-]?secret[_-]?access[_-]?key[^\S\n]*[:=][^\S\n]*["\']([a-zA-Z0-9/+=]{40})["\']', 'AWS Secret Key'),
 
     # Firebase
-    (r'firebase[_-]?api[_-]?key\s*[:=]\s*["\']([a-zA-Z0-9_\-]{30,})["\']', 'Firebase API Key'),
+    (rb'firebase[_-]?api[_-]?key[^\S\n]*[:=][^\S\n]*["\']([a-zA-Z0-9_\-]{30,})["\']', 'Firebase API Key'),
 
     # Database credentials
-    (r'db[_-]?password\s*[:=]\s*["\']([^"\']+)["\']', 'Database Password'),
-    (r'database[_-]?url\s*[:=]\s*["\'][^"\']*:[^"\']*@[^"\']+["\']', 'Database URL with credentials'),
+    (rb'db[_-]?password[^\S\n]*[:=][^\S\n]*["\']([^"\'\n]+)["\']', 'Database Password'),
+    (rb'database[_-]?url[^\S\n]*[:=][^\S\n]*["\'][^"\'\n]*:[^"\'\n]*@[^"\'\n]+["\']', 'Database URL with credentials'),
 
     # Generic passwords
-    (r'password\s*[:=]\s*["\']([^"\']{8,})["\']', 'Password'),
-    (r'passwd\s*[:=]\s*["\']([^"\']{8,})["\']', 'Password'),
-    (r'pwd\s*[:=]\s*["\']([^"\']{8,})["\']', 'Password'),
+    (rb'password[^\S\n]*[:=][^\S\n]*["\']([^"\'\n]{8,})["\']', 'Password'),
+    (rb'passwd[^\S\n]*[:=][^\S\n]*["\']([^"\'\n]{8,})["\']', 'Password'),
+    (rb'pwd[^\S\n]*[:=][^\S\n]*["\']([^"\'\n]{8,})["\']', 'Password'),
 
     # Private keys
-    (r'private[_-]?key\s*[:=]\s*["\']([^"\']+)["\']', 'Private Key'),
-    (r'-----BEGIN (?:RSA |DSA )?PRIVATE KEY-----', 'Private Key Block'),
+    (rb'private[_-]?key[^\S\n]*[:=][^\S\n]*["\']([^"\'\n]+)["\']', 'Private Key'),
+    (rb'-----BEGIN (?:RSA |DSA )?PRIVATE KEY-----', 'Private Key Block'),
 
     # OAuth and Client Secrets
-    (r'client[_-]?secret\s*[:=]\s*["\']([a-zA-Z0-9_\-]{20,})["\']', 'Client Secret'),
-    (r'client[_-]?id\s*[:=]\s*["\']([a-zA-Z0-9_\-]{20,})["\']', 'Client ID'),
+    (rb'client[_-]?secret[^\S\n]*[:=][^\S\n]*["\']([a-zA-Z0-9_\-]{20,})["\']', 'Client Secret'),
+    (rb'client[_-]?id[^\S\n]*[:=][^\S\n]*["\']([a-zA-Z0-9_\-]{20,})["\']', 'Client ID'),
 
     # Generic secrets
-    (r'secret[_-]?key\s*[:=]\s*["\']([a-zA-Z0-9_\-]{16,})["\']', 'Secret Key'),
-    (r'encryption[_-]?key\s*[:=]\s*["\']([a-zA-Z0-9_\-/+=]{16,})["\']', 'Encryption Key'),
+    (rb'secret[_-]?key[^\S\n]*[:=][^\S\n]*["\']([a-zA-Z0-9_\-]{16,})["\']', 'Secret Key'),
+    (rb'encryption[_-]?key[^\S\n]*[:=][^\S\n]*["\']([a-zA-Z0-9_\-/+=]{16,})["\']', 'Encryption Key'),
 ]
 
-# False positive patterns to exclude
-FALSE_POSITIVE_PATTERNS = [
-    r'example\.com',
-    r'your[_-]api[_-]key',
-    r'YOUR[_-]API[_-]KEY',
-    r'<.*>',  # Placeholder patterns
-    r'\$\{.*\}',  # Template variables
-    r'FIXME',
-    r'TODO',
-    r'dummy',
-    r'test',
-    r'sample',
-    r'placeholder',
-]
+# False positive markers to exclude (lowercase, matched as substrings of the lowered value)
+FALSE_POSITIVE_MARKERS = (
+    'example.com',
+    'your_api_key',
+    'your-api-key',
+    'your_api-key',
+    'your-api_key',
+    'fixme',
+    'todo',
+    'dummy',
+    'test',
+    'sample',
+    'placeholder',
+)
+
+# Lines whose first non-blank characters open a // or /* comment
+_COMMENT_LINE_RE = re.compile(rb'[^\S\n]*/[/*]')
+
+# Placeholder patterns (<...>) and template variables (${...})
+_PLACEHOLDER_RE = re.compile(r'<[^>]*>|\$\{[^}]*\}')
+
+
+# Compiled once at import; one pass of _SECRETS_RE replaces a pass per pattern
+_SECRETS_RE, _SECRET_TYPES, _SECRET_VALUE_GROUPS = union_patterns(
+    SECRET_PATTERNS, re.IGNORECASE, compile=_re_engine.compile
+)
+
+# Every secret pattern contains one of these words; files without any are skipped
+_TRIGGERS_RE = re.compile(
+    rb'api|secret|token|bearer|passw|pwd|aws|firebase|client|private|encryption|database|begin',
+    re.IGNORECASE,
+)
 
 
 def is_false_positive(value: str) -> bool:
     """Check if the detected value is likely a false positive."""
     value_lower = value.lower()
-    for pattern in FALSE_POSITIVE_PATTERNS:
-        if re.search(pattern, value_lower, re.IGNORECASE):
-            return True
-    return False
+    if any(marker in value_lower for marker in FALSE_POSITIVE_MARKERS):
+        return True
+    return _PLACEHOLDER_RE.search(value) is not None
 
 
-def scan_file(file_path: Path) -> List[Dict]:
-    """Scan a single file for hardcoded secrets."""
+def scan_file(file_path: str, file_id: Optional[int] = None) -> List[Dict]:
+    """Scan a single file for hardcoded secrets.
+
+    Findings reference the file by file_id when given (scan_project passes its index in the
+    report's files list), and by file_path otherwise.
+    """
+    file_ref = file_path if file_id is None else file_id
     findings = []
 
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            lines = content.split('\n')
+        with open_source(file_path) as content:
+            if not _TRIGGERS_RE.search(content):
+                return findings
+
+            lines = LineCursor(content)
+            match = _SECRETS_RE.search(content)
+            while match:
+                # Like finditer, resume after the match; a false positive only skips one
+                # byte, so a real secret overlapping its span is still found
+                resume = match.end()
+                line_num, line = lines.line_at(match.start())
 
-            for line_num, line in enumerate(lines, 1):
                 # Skip comments
-                if line.strip().startswith('//') or line.strip().startswith('/*'):
-                    continue
-
-                for pattern, secret_type in SECRET_PATTERNS:
-                    matches = re.finditer(pattern, line, re.IGNORECASE)
-                    for match in matches:
-                        value = match.group(1) if len(match.groups()) > 0 else match.group(0)
-
-                        # Skip false positives
-                        if is_false_positive(value):
-                            continue
-
+                if not _COMMENT_LINE_RE.match(line):
+                    index = int(match.lastgroup[1:])
+                    value = match.group(_SECRET_VALUE_GROUPS[index]).decode('utf-8', 'ignore')
+
+                    # Skip false positives
+                    if is_false_positive(value):
+                        resume = match.start() + 1
+                    else:
                         findings.append({
-                            'file': str(file_path),
+                            'file': file_ref,
                             'line': line_num,
-                            'type': secret_type,
-                            'pattern': line.strip(),
+                            'type': _SECRET_TYPES[index],
+                            'pattern': line.strip().decode('utf-8', 'ignore'),
                             'severity': 'HIGH'
                         })
+
+                match = _SECRETS_RE.search(content, resume)
     except Exception as e:
         print(f"Error scanning {file_path}: {e}")
 
     return findings
 
 
-def scan_project(project_root: str) -> Dict:
-    """Scan entire Flutter project for hardcoded secrets."""
-    project_path = Path(project_root)
-    all_findings = []
+def _iter_project_files(project_path: Path) -> Iterator[str]:
+    """Yield paths of files to scan under each SCAN_DIRS directory, skipping its _PRUNED_DIRS."""
+    for scan_dir, extension in SCAN_DIRS.items():
+        yield from iter_files(str(project_path / scan_dir), extension,
+                              pruned=_PRUNED_DIRS.get(scan_dir, frozenset()))
 
-    # Directories to scan
-    scan_dirs = ['lib', 'android', 'ios']
 
-    # File extensions to check
-    dart_files = list(project_path.glob('lib/**/*.dart'))
-    gradle_files = list(project_path.glob('android/**/*.gradle'))
-    plist_files = list(project_path.glob('ios/**/*.plist'))
+def _collect_findings(per_file: Iterable[List[Dict]], output: Optional[TextIO]) -> Tuple[List[Dict], Counter]:
+    """Gather per-file findings and count them by type, writing each to output as one compact JSON line."""
+    all_findings = []
+    by_type = Counter()
+    for findings in per_file:
+        for finding in findings:
+            if output is not None:
+                output.write(',\n    ' if all_findings else '\n    ')
+                output.write(json.dumps(finding, separators=(',', ':')))
+            all_findings.append(finding)
+            by_type[finding['type']] += 1
+    return all_findings, by_type
+
+
+def scan_project(project_root: str, jobs: Optional[int] = None, output: Optional[TextIO] = None) -> Dict:
+    """Scan entire Flutter project for hardcoded secrets.
+
+    Scanned paths are listed once under 'files' and each finding's 'file' is an index into
+    that list. When output is given, the results are streamed to it as JSON while scanning:
+    the file list, then findings one per line, then the summary fields once the totals are known.
+
+    Streaming only avoids building the report text in memory: every finding is still kept in
+    the returned 'findings' list (the console report prints them all), so memory use still
+    grows with the number of findings.
+    """
+    project_path = Path(project_root)
 
-    files_to_scan = dart_files + gradle_files + plist_files
+    files_to_scan = list(_iter_project_files(project_path))
 
     print(f"Scanning {len(files_to_scan)} files for hardcoded secrets...")
 
-    for file_path in files_to_scan:
-        findings = scan_file(file_path)
-        all_findings.extend(findings)
+    if output is not None:
+        output.write(f'{{\n  "files": {json.dumps(files_to_scan)},\n  "findings": [')
+
+    file_ids = range(len(files_to_scan))
+    if jobs == 1:
+        all_findings, by_type = _collect_findings(map(scan_file, files_to_scan, file_ids), output)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            all_findings, by_type = _collect_findings(
+                executor.map(scan_file, files_to_scan, file_ids, chunksize=32), output
+            )
 
-    return {
+    results = {
+        'files': files_to_scan,
         'total_files_scanned': len(files_to_scan),
         'total_findings': len(all_findings),
+        'findings_by_type': dict(sorted(by_type.items())),
         'findings': all_findings
     }
 
+    if output is not None:
+        output.write('\n  ]')
+        for key in ('total_files_scanned', 'total_findings', 'findings_by_type'):
+            output.write(f',\n  "{key}": {json.dumps(results[key])}')
+        output.write('\n}\n')
+
+    return results
+
 
 def main():
     """Main execution function."""
     import sys
 
-    if len(sys.argv) < 2:
-        project_root = os.getcwd()
-    else:
-        project_root = sys.argv[1]
+    parser = argparse.ArgumentParser(description='OWASP M1: Scan a Flutter project for hardcoded secrets')
+    parser.add_argument('project_root', nargs='?', default=os.getcwd(),
+                        help='Flutter project root (default: current directory)')
+    parser.add_argument('--jobs', type=positive_int, default=None,
+                        help='Worker processes for file scanning (default: CPU count, 1 scans serially)')
+    args = parser.parse_args()
+
+    project_root = args.project_root
 
     print(f"OWASP M1: Scanning for hardcoded secrets in {project_root}\n")
 
-    results = scan_project(project_root)
+    # Results are streamed to a sibling temp file as the scan runs, and only replace the
+    # previous report once the scan has finished, so a failed scan never leaves a partial file
+    output_file = Path(project_root) / 'owasp_m1_secrets_scan.json'
+    temp_file = output_file.with_suffix('.json.tmp')
+    try:
+        with open(temp_file, 'w') as f:
+            results = scan_project(project_root, jobs=args.jobs, output=f)
+        os.replace(temp_file, output_file)
+    except BaseException:
+        temp_file.unlink(missing_ok=True)
+        raise
 
     print(f"\n{'='*60}")
     print(f"Scan Results:")
@@ -161,12 +267,7 @@ def main():
 
     if results['findings']:
         print("Findings by type:")
-        findings_by_type = {}
-        for finding in results['findings']:
-            secret_type = finding['type']
-            findings_by_type[secret_type] = findings_by_type.get(secret_type, 0) + 1
-
-        for secret_type, count in sorted(findings_by_type.items()):
+        for secret_type, count in results['findings_by_type'].items():
             print(f"  - {secret_type}: {count}")
 
         print(f"\n{'='*60}")
@@ -175,15 +276,10 @@ def main():
 
         for i, finding in enumerate(results['findings'], 1):
             print(f"{i}. [{finding['severity']}] {finding['type']}")
-            print(f"   File: {finding['file']}:{finding['line']}")
+            print(f"   File: {results['files'][finding['file']]}:{finding['line']}")
             print(f"   Code: {finding['pattern']}")
             print()
 
-    # Save results to JSON
-    output_file = Path(project_root) / 'owasp_m1_secrets_scan.json'
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=2)
-
     print(f"Results saved to: {output_file}")
 
     # Exit with error code if secrets found
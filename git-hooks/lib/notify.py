@@ -8,30 +8,72 @@ import os
 import sys
 import subprocess
 
+# Resolved once at import; platform.system() may probe uname on each call
+_SYSTEM = platform.system()
+
+# Notifier command prefixes; the script or title/message arguments are appended per call
+_OSASCRIPT = ['osascript', '-e']
+_NOTIFY_SEND = ['notify-send']
+_POWERSHELL = ['powershell', '-Command']
+
+# Unpackaged apps can only raise toasts under a registered AppUserModelID; PowerShell's is
+# present on every Windows 10+ install, and is the one BurntToast uses by default
+_TOAST_APP_ID = r'{1AC14E77-02E7-4E5D-B744-2EB1AE5198B7}\WindowsPowerShell\v1.0\powershell.exe'
+
+
+def _applescript_quote(text):
+    """Escape text for use inside an AppleScript double-quoted string."""
+    return text.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _ps_quote(text):
+    """Escape text for use inside a PowerShell single-quoted string.
+
+    PowerShell also ends such strings at typographic single quotes, so those are doubled too.
+    """
+    return ''.join(ch * 2 if ch in "'\u2018\u2019\u201a\u201b" else ch for ch in text)
+
+
+def _winrt_toast(title, message):
+    """Show a Windows toast in-process through WinRT (requires the winsdk package)."""
+    from xml.sax.saxutils import escape
+    from winsdk.windows.data.xml.dom import XmlDocument
+    from winsdk.windows.ui.notifications import ToastNotification, ToastNotificationManager
+
+    document = XmlDocument()
+    document.load_xml(
+        '<toast><visual><binding template="ToastGeneric">'
+        f'<text>{escape(title)}</text><text>{escape(message)}</text>'
+        '</binding></visual></toast>'
+    )
+    ToastNotificationManager.create_toast_notifier(_TOAST_APP_ID).show(ToastNotification(document))
+
 
 def notify(title, message):
     """Send a desktop notification."""
-    system = platform.system()
-
     try:
-        if system == 'Darwin':  # macOS
-            script = f'display notification "{message}" with title "{title}"'
-            subprocess.run(['osascript', '-e', script],
+        if _SYSTEM == 'Darwin':  # macOS
+            script = (f'display notification "{_applescript_quote(message)}" '
+                      f'with title "{_applescript_quote(title)}"')
+            subprocess.run(_OSASCRIPT + [script],
                          check=False,
                          capture_output=True)
 
-        elif system == 'Linux':
+        elif _SYSTEM == 'Linux':
             # Try notify-send (most Linux desktops)
-            subprocess.run(['notify-send', title, message],
+            subprocess.run(_NOTIFY_SEND + [title, message],
                          check=False,
                          capture_output=True)
 
-        elif system == 'Windows':
-            # Try Windows 10+ toast notifications
-            ps_script = f"New-BurntToastNotification -Text '{title}', '{message}'"
-            subprocess.run(['powershell', '-Command', ps_script],
-                         check=False,
-                         capture_output=True)
+        elif _SYSTEM == 'Windows':
+            # Try Windows 10+ toast notifications, in-process when winsdk is installed
+            try:
+                _winrt_toast(title, message)
+            except ImportError:
+                ps_script = f"New-BurntToastNotification -Text '{_ps_quote(title)}', '{_ps_quote(message)}'"
+                subprocess.run(_POWERSHELL + [ps_script],
+                             check=False,
+                             capture_output=True)
 
     except Exception:
         # Silently fail if notifications aren't available
@@ -39,8 +81,17 @@ def notify(title, message):
 
 
 if __name__ == '__main__':
+    if sys.argv[1:] == ['--stdin']:
+        # One "title<TAB>message" notification per line, all sent from this process
+        for line in sys.stdin:
+            title, tab, message = line.rstrip('\r\n').partition('\t')
+            if tab:
+                notify(title, message)
+        sys.exit(0)
+
     if len(sys.argv) != 3:
         print("Usage: notify.py <title> <message>", file=sys.stderr)
+        print("       notify.py --stdin  (reads title<TAB>message lines)", file=sys.stderr)
         sys.exit(1)
 
     notify(sys.argv[1], sys.argv[2])
@@ -3,7 +3,32 @@
 Cross-Platform UUID Generator
 Provides UUID v4 generation for any platform
 """
-import uuid
+import os
+import sys
+
+
+def uuid4s(count):
+    """Return count random (version 4) UUID strings, drawing all bytes from one os.urandom call."""
+    b = bytearray(os.urandom(16 * count))
+    uuids = []
+    for i in range(0, len(b), 16):
+        b[i + 6] = (b[i + 6] & 0x0F) | 0x40  # version 4
+        b[i + 8] = (b[i + 8] & 0x3F) | 0x80  # RFC 4122 variant
+        h = b[i:i + 16].hex()
+        uuids.append(f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}")
+    return uuids
+
+
+def uuid4():
+    """Return a random (version 4) UUID string built from os.urandom."""
+    return uuid4s(1)[0]
+
 
 if __name__ == '__main__':
-    print(uuid.uuid4())
+    if len(sys.argv) > 2 or (len(sys.argv) == 2 and not sys.argv[1].isdecimal()):
+        print("Usage: uuid.py [count]", file=sys.stderr)
+        sys.exit(1)
+
+    count = int(sys.argv[1]) if len(sys.argv) == 2 else 1
+    if count:
+        sys.stdout.write('\n'.join(uuid4s(count)) + '\n')